@@ -2,22 +2,82 @@
 
 from __future__ import annotations
 
-from base64 import b64decode
+import json
+import threading
+import time
+
+from binascii import a2b_base64
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
 from datetime import datetime, date
 from enum import IntEnum, unique
-from importlib.metadata import version
-from pathlib import PurePosixPath
-from typing import Literal, Any, TypedDict, overload, cast
-from urllib.parse import urljoin, urlparse
+from importlib.metadata import version, PackageNotFoundError
+from typing import Literal, Any, TypedDict, Callable, overload, cast
+from urllib.parse import quote, urlsplit
 
 import requests
 
 from urllib3.util import Retry
 from requests.adapters import HTTPAdapter
 
+try:
+    # Optional, a lot faster than the standard library on big responses (HAR)
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+try:
+    # Optional, SIMD accelerated base64 decoding
+    import pybase64
+    _base64_decode: Callable[[str], bytes] = pybase64.b64decode
+except ImportError:
+    _base64_decode = a2b_base64
+
 BROWSER = Literal['chromium', 'firefox', 'webkit']
 
 
+def _parse_json(content: bytes) -> Any:
+    # Keep raising the same exception as Response.json(), whichever parser is used.
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than the standard library (lone surrogates in the HTML or the HAR),
+            # retry with the parser used by Response.json().
+            pass
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError as e:
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos) from e
+    except ValueError as e:
+        # The body isn't even valid text
+        raise requests.exceptions.JSONDecodeError(str(e), '', 0) from e
+
+
+def _json_dumps(obj: Any) -> bytes:
+    if HAS_ORJSON:
+        try:
+            return orjson.dumps(obj)
+        except orjson.JSONEncodeError:
+            # orjson rejects things the json module (used by requests) accepts:
+            # non-str dict keys, lone surrogates, integers over 64 bits.
+            pass
+    return json.dumps(obj).encode()
+
+
+try:
+    _DEFAULT_USERAGENT = f'PyLacus / {version("pylacus")}'
+except PackageNotFoundError:
+    _DEFAULT_USERAGENT = 'PyLacus / unknown'
+
+# Optional settings passed to Lacus by enqueue when they are set, in the order of the values in enqueue
+_ENQUEUE_OPTIONAL_KEYS = ('browser', 'device_name', 'user_agent', 'proxy', 'cookies', 'headers',
+                          'http_credentials', 'geolocation', 'timezone_id', 'locale', 'color_scheme',
+                          'viewport', 'referer', 'uuid')
+_ENQUEUE_NUMERIC_KEYS = ('general_timeout_in_sec', 'max_retries')
+
+
 @unique
 class CaptureStatus(IntEnum):
     '''The status of the capture'''
@@ -27,6 +87,12 @@ class CaptureStatus(IntEnum):
     ONGOING = 2
 
 
+_STATUS_MAP = {status.value: status for status in CaptureStatus}
+
+# Number of UNKNOWN status in a row after which wait_for_capture gives up
+_MAX_UNKNOWN_STATUS = 3
+
+
 class CaptureResponse(TypedDict, total=False):
     '''A capture made by Lacus. With the base64 encoded image and downloaded file decoded to bytes.'''
 
@@ -97,40 +163,75 @@ class CaptureSettings(TypedDict, total=False):
 
 class PyLacus():
 
+    _b64decode = staticmethod(_base64_decode)
+
     def __init__(self, root_url: str, useragent: str | None=None,
-                 *, proxies: dict[str, str] | None=None) -> None:
+                 *, proxies: dict[str, str] | None=None, pool_maxsize: int=64,
+                 captures_cache_size: int=0) -> None:
         '''Query a specific instance.
 
         :param root_url: URL of the instance to query.
         :param useragent: The User Agent used by requests to run the HTTP requests against Lacus, it is *not* passed to the captures.
         :param proxies: The proxies to use to connect to lacus (not the ones given to the capture itself) - More details: https://requests.readthedocs.io/en/latest/user/advanced/#proxies
+        :param pool_maxsize: The maximum number of connections to keep alive in the pool, increase it if you run a lot of concurrent requests.
+        :param captures_cache_size: The number of done captures kept in memory by get_capture, 0 (default) to disable it. Captures can be big, only enable it if you fetch the same captures more than once.
         '''
         self.root_url = root_url
 
-        if not urlparse(self.root_url).scheme:
+        if not urlsplit(self.root_url).scheme:
             self.root_url = 'http://' + self.root_url
         if not self.root_url.endswith('/'):
             self.root_url += '/'
+        self._enqueue_url = self.root_url + 'enqueue'
+        self._status_base = self.root_url + 'capture_status/'
+        self._result_base = self.root_url + 'capture_result/'
         self.session = requests.session()
-        self.session.headers['user-agent'] = useragent if useragent else f'PyLacus / {version("pylacus")}'
+        self.session.headers['user-agent'] = useragent if useragent else _DEFAULT_USERAGENT
         if proxies:
             self.session.proxies.update(proxies)
         retries = Retry(total=5, backoff_factor=0.1, status_forcelist=[500, 502, 503, 504])
-        self.session.mount('http://', HTTPAdapter(max_retries=retries))
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=pool_maxsize, max_retries=retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._is_up_cache: tuple[float, bool] | None = None
+        self._captures_cache_size = captures_cache_size
+        self._captures_cache: OrderedDict[tuple[str, bool], CaptureResponse | CaptureResponseJson] = OrderedDict()
+        self._captures_cache_lock = threading.Lock()
+
+    def _get_json(self, url: str, params: dict[str, Any] | None=None) -> Any:
+        # The raw body of the response can be very big (base64 encoded screenshot and downloaded file),
+        # it is released when we return so it isn't kept in memory alongside the decoded blobs.
+        r = self.session.get(url, params=params)
+        return _parse_json(r.content)
 
     @property
     def is_up(self) -> bool:
-        '''Test if the given instance is accessible'''
+        '''Test if the given instance is accessible, the result is reused for 1 second.'''
+        return self.check_is_up(ttl=1.0)
+
+    def check_is_up(self, *, ttl: float=0.0) -> bool:
+        '''Test if the given instance is accessible, reusing the result of the last check if it is recent enough.
+
+        :param ttl: For how long (in seconds) the result of the last check is reused, 0 to always run a new check.
+        '''
+        now = time.monotonic()
+        if self._is_up_cache and now - self._is_up_cache[0] < ttl:
+            return self._is_up_cache[1]
         try:
             r = self.session.head(self.root_url, timeout=2.0)
+            up = r.status_code == 200
         except requests.exceptions.ConnectionError:
-            return False
-        return r.status_code == 200
+            up = False
+        self._is_up_cache = (now, up)
+        return up
+
+    def invalidate_is_up(self) -> None:
+        '''Forget the result of the last accessibility check, the next one will query the instance.'''
+        self._is_up_cache = None
 
     def redis_up(self) -> dict[str, Any]:
         '''Check if redis is up and running'''
-        r = self.session.get(urljoin(self.root_url, 'redis_up'))
-        return r.json()
+        return self._get_json(self.root_url + 'redis_up')
 
     @overload
     def enqueue(self, *, settings: CaptureSettings | None=None) -> str:
@@ -197,7 +298,8 @@ class PyLacus():
         '''Submit a new capture. Pass a typed dictionary or any of the relevant settings, get the UUID.'''
         to_enqueue: CaptureSettings
         if settings:
-            to_enqueue = settings
+            # None is the same as an unset setting in Lacus, no need to send it.
+            to_enqueue = cast(CaptureSettings, {k: v for k, v in settings.items() if v is not None})
         else:
             to_enqueue = {'depth': depth, 'java_script_enabled': java_script_enabled,
                           'with_favicon': with_favicon, 'allow_tracking': allow_tracking,
@@ -208,59 +310,65 @@ class PyLacus():
             elif document_name and document:
                 to_enqueue['document_name'] = document_name
                 to_enqueue['document'] = document
-            if browser:
-                to_enqueue['browser'] = browser
-            if device_name:
-                to_enqueue['device_name'] = device_name
-            if user_agent:
-                to_enqueue['user_agent'] = user_agent
-            if proxy:
-                to_enqueue['proxy'] = proxy
-            if general_timeout_in_sec is not None:  # that would be a terrible idea, but this one could be 0
-                to_enqueue['general_timeout_in_sec'] = general_timeout_in_sec
-            if cookies:
-                to_enqueue['cookies'] = cookies
-            if headers:
-                to_enqueue['headers'] = headers
-            if http_credentials:
-                to_enqueue['http_credentials'] = http_credentials
-            if geolocation:
-                to_enqueue['geolocation'] = geolocation
-            if timezone_id:
-                to_enqueue['timezone_id'] = timezone_id
-            if locale:
-                to_enqueue['locale'] = locale
-            if color_scheme:
-                to_enqueue['color_scheme'] = color_scheme
-            if viewport:
-                to_enqueue['viewport'] = viewport
-            if referer:
-                to_enqueue['referer'] = referer
-            if max_retries is not None:
-                to_enqueue['max_retries'] = max_retries
-            if uuid:
-                to_enqueue['uuid'] = uuid
-
-        r = self.session.post(urljoin(self.root_url, 'enqueue'), json=to_enqueue)
-        return r.json()
+            optional_values = (browser, device_name, user_agent, proxy, cookies, headers,
+                               http_credentials, geolocation, timezone_id, locale, color_scheme,
+                               viewport, referer, uuid)
+            to_enqueue.update(cast(CaptureSettings, {k: v for k, v in zip(_ENQUEUE_OPTIONAL_KEYS, optional_values) if v}))
+            # that would be a terrible idea, but those ones could be 0
+            numeric_values = (general_timeout_in_sec, max_retries)
+            to_enqueue.update(cast(CaptureSettings, {k: v for k, v in zip(_ENQUEUE_NUMERIC_KEYS, numeric_values) if v is not None}))
+
+        r = self.session.post(self._enqueue_url, data=_json_dumps(to_enqueue),
+                              headers={'content-type': 'application/json'})
+        return _parse_json(r.content)
+
+    def enqueue_bulk(self, settings: list[CaptureSettings], *, max_workers: int=16) -> list[str]:
+        '''Submit many captures at once, the requests are run concurrently. Get the UUIDs, in the same order as the settings.
+
+        :param settings: The settings of each capture to enqueue.
+        :param max_workers: The maximum number of requests in flight at the same time.
+        '''
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(lambda s: self.enqueue(settings=s), settings))
 
     def get_capture_status(self, uuid: str) -> CaptureStatus:
         '''Get the status of the capture.'''
-        r = self.session.get(urljoin(self.root_url, str(PurePosixPath('capture_status', uuid))))
-        return r.json()
+        status = self._get_json(self._status_base + quote(uuid, safe=''))
+        if not isinstance(status, int):
+            # Lacus answered with an error message instead of a status
+            return CaptureStatus.UNKNOWN
+        return _STATUS_MAP.get(status, CaptureStatus.UNKNOWN)
+
+    def get_capture_statuses(self, uuids: list[str], *, max_workers: int=16) -> dict[str, CaptureStatus]:
+        '''Get the status of many captures at once, the requests are run concurrently.
+
+        :param uuids: The UUIDs of the captures.
+        :param max_workers: The maximum number of requests in flight at the same time.
+        '''
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(uuids, executor.map(self.get_capture_status, uuids)))
 
     def _decode_response(self, capture: CaptureResponseJson) -> CaptureResponse:
-        decoded_capture = cast(CaptureResponse, capture)
-        if capture.get('png') and capture['png']:
-            decoded_capture['png'] = b64decode(capture['png'])
-        if capture.get('downloaded_file') and capture['downloaded_file']:
-            decoded_capture['downloaded_file'] = b64decode(capture['downloaded_file'])
-        if capture.get('potential_favicons') and capture['potential_favicons']:
-            decoded_capture['potential_favicons'] = {b64decode(f) for f in capture['potential_favicons']}
-        if capture.get('children') and capture['children']:
-            for child in capture['children']:
-                child = self._decode_response(child)
-        return decoded_capture
+        # Decode in place, walking the children with an explicit stack instead of recursing.
+        b64decode = self._b64decode
+        stack: list[dict[str, Any]] = [cast(dict[str, Any], capture)]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            current = pop()
+            png = current.get('png')
+            if png:
+                current['png'] = b64decode(png)
+            downloaded_file = current.get('downloaded_file')
+            if downloaded_file:
+                current['downloaded_file'] = b64decode(downloaded_file)
+            potential_favicons = current.get('potential_favicons')
+            if potential_favicons:
+                current['potential_favicons'] = {b64decode(f) for f in potential_favicons}
+            children = current.get('children')
+            if children:
+                extend(children)
+        return cast(CaptureResponse, capture)
 
     @overload
     def get_capture(self, uuid: str, *, decode: Literal[True]=True) -> CaptureResponse:
@@ -271,12 +379,123 @@ class PyLacus():
         ...
 
     def get_capture(self, uuid: str, *, decode: bool=True) -> CaptureResponse | CaptureResponseJson:
-        '''Get the the capture, with the screenshot and downloaded file decoded to bytes or base64 encoded.'''
-        r = self.session.get(urljoin(self.root_url, str(PurePosixPath('capture_result', uuid))))
-        response: CaptureResponseJson = r.json()
-        if not decode:
-            return response
-        return self._decode_response(response)
+        '''Get the the capture, with the screenshot and downloaded file decoded to bytes or base64 encoded.
+
+        If the client has a captures cache (see captures_cache_size), done captures are kept in memory
+        and returned on the next calls, use invalidate_capture to fetch them again from lacus.
+        A shallow copy is returned: the nested values (har, cookies, children, ...) are shared with the cache and must not be modified.
+        '''
+        key = (uuid, decode)
+        if self._captures_cache_size:
+            with self._captures_cache_lock:
+                if key in self._captures_cache:
+                    self._captures_cache.move_to_end(key)
+                    return self._captures_cache[key].copy()
+
+        capture: CaptureResponse | CaptureResponseJson
+        url = self._result_base + quote(uuid, safe='')
+        if decode:
+            capture = self._decode_response(self._get_json(url))
+        else:
+            capture = self._get_json(url)
+        if self._captures_cache_size and capture.get('status') == CaptureStatus.DONE:
+            with self._captures_cache_lock:
+                self._captures_cache[key] = capture.copy()
+                if len(self._captures_cache) > self._captures_cache_size:
+                    self._captures_cache.popitem(last=False)
+        return capture
+
+    def invalidate_capture(self, uuid: str) -> None:
+        '''Remove a capture from the ones kept in memory by get_capture (see captures_cache_size).'''
+        with self._captures_cache_lock:
+            self._captures_cache.pop((uuid, True), None)
+            self._captures_cache.pop((uuid, False), None)
+
+    def wait_for_capture(self, uuid: str, *, poll: float=0.5, max_poll: float=5.0,
+                         timeout: float=300) -> CaptureResponse:
+        '''Wait for a capture to be done and get it, decoded. The status is polled with an exponential backoff.
+
+        :param uuid: The UUID of the capture.
+        :param poll: The initial delay between two status checks, in seconds.
+        :param max_poll: The maximum delay between two status checks, in seconds.
+        :param timeout: For how long to wait for the capture, in seconds. TimeoutError is raised when it expires.
+
+        ValueError is raised if Lacus doesn't know the capture (wrong UUID or expired result).
+        '''
+        return self._wait_for_capture(uuid, poll=poll, max_poll=max_poll, timeout=timeout,
+                                      deadline=time.monotonic() + timeout)
+
+    def _wait_for_capture(self, uuid: str, *, poll: float, max_poll: float, timeout: float,
+                          deadline: float, stop: threading.Event | None=None) -> CaptureResponse:
+        unknown = 0
+        while True:
+            status = self.get_capture_status(uuid)
+            if status == CaptureStatus.DONE:
+                return self.get_capture(uuid)
+            if status == CaptureStatus.UNKNOWN:
+                unknown += 1
+                if unknown >= _MAX_UNKNOWN_STATUS:
+                    raise ValueError(f'The capture {uuid} is unknown to Lacus.')
+            else:
+                unknown = 0
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if stop is None:
+                time.sleep(min(poll, remaining))
+            elif stop.wait(min(poll, remaining)):
+                raise CancelledError(f'Stopped waiting for the capture {uuid}.')
+            poll = min(poll * 1.7, max_poll)
+        raise TimeoutError(f'The capture {uuid} is not done after {timeout}s.')
+
+    def wait_for_captures(self, uuids: list[str], *, poll: float=0.5, max_poll: float=5.0,
+                          timeout: float=300, max_workers: int=16) -> dict[str, CaptureResponse]:
+        '''Wait for many captures to be done and get them, decoded. The captures are waited for concurrently, see wait_for_capture.
+
+        If waiting for one of the captures fails, the other ones are stopped and the exception is raised.
+
+        :param uuids: The UUIDs of the captures.
+        :param poll: The initial delay between two status checks of a capture, in seconds.
+        :param max_poll: The maximum delay between two status checks of a capture, in seconds.
+        :param timeout: For how long to wait for all the captures, in seconds. TimeoutError is raised when it expires.
+        :param max_workers: The maximum number of captures waited for at the same time.
+        '''
+        deadline = time.monotonic() + timeout
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._wait_for_capture, uuid, poll=poll, max_poll=max_poll,
+                                       timeout=timeout, deadline=deadline, stop=stop): uuid
+                       for uuid in uuids}
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                stop.set()
+                for future in futures:
+                    future.cancel()
+                raise
+        return {uuid: future.result() for future, uuid in futures.items()}
+
+    @overload
+    def get_captures(self, uuids: list[str], *, decode: Literal[True]=True, max_workers: int=8) -> dict[str, CaptureResponse]:
+        ...
+
+    @overload
+    def get_captures(self, uuids: list[str], *, decode: Literal[False], max_workers: int=8) -> dict[str, CaptureResponseJson]:
+        ...
+
+    def get_captures(self, uuids: list[str], *, decode: bool=True,
+                     max_workers: int=8) -> dict[str, CaptureResponse] | dict[str, CaptureResponseJson]:
+        '''Get many captures at once, the requests and the decoding are run concurrently.
+
+        :param uuids: The UUIDs of the captures.
+        :param decode: If True, the screenshots and downloaded files are decoded to bytes, as in get_capture.
+        :param max_workers: The maximum number of captures fetched at the same time.
+        '''
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if decode:
+                return dict(zip(uuids, executor.map(self.get_capture, uuids)))
+            return dict(zip(uuids, executor.map(lambda uuid: self.get_capture(uuid, decode=False), uuids)))
 
     # # Stats and status of the lacus instance
 
@@ -286,40 +505,34 @@ class PyLacus():
         :param cardinality_only: If True, only return the number of entries in each list (captures, retries, failed retries), instead of the URLs.
         '''
         if cardinality_only:
-            url_path = PurePosixPath('daily_stats')
+            url = self.root_url + 'daily_stats'
         else:
-            url_path = PurePosixPath('daily_stats_details')
+            url = self.root_url + 'daily_stats_details'
 
         if d:
             if isinstance(d, (date, datetime)):
-                url_path /= d.isoformat()
+                url += '/' + d.isoformat()
             else:
-                url_path /= d
+                url += '/' + d
 
-        r = self.session.get(urljoin(self.root_url, str(url_path)))
-        return r.json()
+        return self._get_json(url)
 
     def db_status(self) -> dict[str, Any]:
         '''Gets the database status (number of keys, memory usage)'''
-        r = self.session.get(urljoin(self.root_url, 'db_status'))
-        return r.json()
+        return self._get_json(self.root_url + 'db_status')
 
     def ongoing_captures(self, *, with_settings: bool=False) -> list[dict[str, Any]]:
-        r = self.session.get(urljoin(self.root_url, 'ongoing_captures'),
-                             params={'with_settings': True} if with_settings else {})
-        return r.json()
+        return self._get_json(self.root_url + 'ongoing_captures',
+                              params={'with_settings': True} if with_settings else {})
 
     def enqueued_captures(self, *, with_settings: bool=False) -> list[dict[str, Any]]:
-        r = self.session.get(urljoin(self.root_url, 'enqueued_captures'),
-                             params={'with_settings': True} if with_settings else {})
-        return r.json()
+        return self._get_json(self.root_url + 'enqueued_captures',
+                              params={'with_settings': True} if with_settings else {})
 
     def status(self) -> dict[str, Any]:
         '''Get the status of the instance.'''
-        r = self.session.get(urljoin(self.root_url, 'lacus_status'))
-        return r.json()
+        return self._get_json(self.root_url + 'lacus_status')
 
     def is_busy(self) -> bool:
         '''Check if the instance is busy.'''
-        r = self.session.get(urljoin(self.root_url, 'is_busy'))
-        return r.json()
+        return self._get_json(self.root_url + 'is_busy')
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import json
+import time
+import unittest
+
+from unittest import mock
+
+import requests
+
+from pylacus import PyLacus
+from pylacus.api import CaptureStatus, _json_dumps, _parse_json
+
+
+class TestJson(unittest.TestCase):
+
+    def test_parse_lone_surrogate(self) -> None:
+        # Unpaired surrogate escape, as found in broken JS strings on web pages
+        body = b'{"html": "broken \\ud800 string"}'
+        self.assertEqual(_parse_json(body), {'html': 'broken \ud800 string'})
+        with mock.patch('pylacus.api.HAS_ORJSON', False):
+            self.assertEqual(_parse_json(body), {'html': 'broken \ud800 string'})
+
+    def test_parse_invalid(self) -> None:
+        for body in (b'<html>502 Bad Gateway</html>', b''):
+            with self.assertRaises(requests.exceptions.JSONDecodeError):
+                _parse_json(body)
+            with mock.patch('pylacus.api.HAS_ORJSON', False):
+                with self.assertRaises(requests.exceptions.JSONDecodeError):
+                    _parse_json(body)
+
+    def test_dumps_fallback(self) -> None:
+        # Not supported by orjson, but by the json module used by requests
+        for obj in ({'viewport': {1: 2}}, {'referer': 'broken \ud800'}, {'priority': 2**70}):
+            self.assertEqual(_json_dumps(obj), json.dumps(obj).encode())
+
+
+class TestStatus(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = PyLacus(root_url="http://127.0.0.1:7100")
+
+    def test_status(self) -> None:
+        with mock.patch.object(self.client.session, 'get') as get:
+            get.return_value.content = b'1'
+            self.assertIs(self.client.get_capture_status('uuid'), CaptureStatus.DONE)
+            get.return_value.content = b'42'
+            self.assertIs(self.client.get_capture_status('uuid'), CaptureStatus.UNKNOWN)
+            # Error message from Lacus instead of a status
+            get.return_value.content = b'{"message": "The requested URL was not found on the server."}'
+            self.assertIs(self.client.get_capture_status('uuid'), CaptureStatus.UNKNOWN)
+
+
+class TestWait(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.client = PyLacus(root_url="http://127.0.0.1:7100")
+        self.get_capture = mock.patch.object(self.client, 'get_capture', side_effect=lambda uuid: {'status': 1, 'uuid': uuid}).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_wait(self) -> None:
+        with mock.patch.object(self.client, 'get_capture_status',
+                               side_effect=[CaptureStatus.UNKNOWN, CaptureStatus.QUEUED, CaptureStatus.UNKNOWN,
+                                            CaptureStatus.ONGOING, CaptureStatus.DONE]):
+            self.assertEqual(self.client.wait_for_capture('uuid', poll=0.01), {'status': 1, 'uuid': 'uuid'})
+
+    def test_wait_unknown(self) -> None:
+        with mock.patch.object(self.client, 'get_capture_status', return_value=CaptureStatus.UNKNOWN) as status:
+            with self.assertRaises(ValueError):
+                self.client.wait_for_capture('uuid', poll=0.01)
+            self.assertEqual(status.call_count, 3)
+
+    def test_wait_timeout(self) -> None:
+        with mock.patch.object(self.client, 'get_capture_status', return_value=CaptureStatus.ONGOING):
+            start = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                self.client.wait_for_capture('uuid', poll=0.05, max_poll=5, timeout=0.2)
+            # The last sleep is capped to the deadline
+            self.assertLess(time.monotonic() - start, 1)
+
+    def test_wait_many_first_error(self) -> None:
+        def status(uuid: str) -> CaptureStatus:
+            return CaptureStatus.UNKNOWN if uuid == 'unknown' else CaptureStatus.ONGOING
+
+        with mock.patch.object(self.client, 'get_capture_status', side_effect=status):
+            start = time.monotonic()
+            with self.assertRaises(ValueError):
+                self.client.wait_for_captures(['ongoing1', 'unknown', 'ongoing2', 'ongoing3'],
+                                              poll=0.01, max_poll=1, timeout=60, max_workers=2)
+            # The other captures are not waited for until the timeout
+            self.assertLess(time.monotonic() - start, 5)
+
+    def test_wait_many_timeout(self) -> None:
+        with mock.patch.object(self.client, 'get_capture_status', return_value=CaptureStatus.ONGOING):
+            start = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                self.client.wait_for_captures(['uuid1', 'uuid2', 'uuid3'], poll=0.05, timeout=0.2, max_workers=1)
+            # One deadline for all the captures, even with more captures than workers
+            self.assertLess(time.monotonic() - start, 1)
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
-import time
 import unittest
 
+from unittest import mock
+
 from pylacus import PyLacus
 from pylacus.api import CaptureStatus
 
@@ -17,12 +18,56 @@ class TestBasic(unittest.TestCase):
         self.assertTrue(self.client.is_up)
         self.assertFalse(self.client.is_busy())
 
+    def test_is_up_cache(self) -> None:
+        with mock.patch.object(self.client.session, 'head', wraps=self.client.session.head) as head:
+            self.assertTrue(self.client.check_is_up(ttl=0))
+            self.assertEqual(head.call_count, 1)
+            # Reuse the last result
+            self.assertTrue(self.client.check_is_up(ttl=60))
+            self.assertTrue(self.client.is_up)
+            self.assertEqual(head.call_count, 1)
+            # Force a new check
+            self.assertTrue(self.client.check_is_up(ttl=0))
+            self.assertEqual(head.call_count, 2)
+            self.client.invalidate_is_up()
+            self.assertTrue(self.client.is_up)
+            self.assertEqual(head.call_count, 3)
+
     def test_submit(self) -> None:
         uuid = self.client.enqueue(url="circl.lu")
-        while True:
-            status = self.client.get_capture_status(uuid)
-            if status == CaptureStatus.DONE:
-                break
-            time.sleep(5)
-        response = self.client.get_capture(uuid)
+        response = self.client.wait_for_capture(uuid)
         self.assertEqual(response['status'], 1)
+
+    def test_submit_bulk(self) -> None:
+        uuids = self.client.enqueue_bulk([{'url': 'circl.lu'}, {'url': 'lookyloo.eu'}])
+        self.assertEqual(len(uuids), 2)
+        statuses = self.client.get_capture_statuses(uuids)
+        self.assertEqual(set(statuses), set(uuids))
+        for status in statuses.values():
+            self.assertIsInstance(status, CaptureStatus)
+            self.assertNotEqual(status, CaptureStatus.UNKNOWN)
+
+        captures = self.client.wait_for_captures(uuids)
+        self.assertEqual(set(captures), set(uuids))
+        for capture in captures.values():
+            self.assertEqual(capture['status'], 1)
+
+        raw_captures = self.client.get_captures(uuids, decode=False)
+        self.assertEqual(set(raw_captures), set(uuids))
+        for uuid, raw_capture in raw_captures.items():
+            self.assertEqual(raw_capture['status'], 1)
+            if raw_capture.get('png'):
+                self.assertIsInstance(raw_capture['png'], str)
+                self.assertIsInstance(captures[uuid]['png'], bytes)
+
+    def test_captures_cache(self) -> None:
+        client = PyLacus(root_url="http://127.0.0.1:7100", captures_cache_size=4)
+        uuid = client.enqueue(url="circl.lu")
+        capture = client.wait_for_capture(uuid)
+        cached = client.get_capture(uuid)
+        self.assertEqual(cached, capture)
+        self.assertIsNot(cached, capture)
+        cached['status'] = -1
+        self.assertEqual(client.get_capture(uuid)['status'], 1)
+        client.invalidate_capture(uuid)
+        self.assertEqual(client.get_capture(uuid)['status'], 1)